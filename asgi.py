@@ -0,0 +1,25 @@
+from a2wsgi import WSGIMiddleware
+from app import app
+from config import env_int
+from async_orders import dispatch, async_engine
+
+#ASGI entry point, e.g. uvicorn asgi:application --workers 4
+#or gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+#The order endpoints in async_orders.py run on the event loop, every other route runs in the
+#Flask app on a thread pool of WSGI_THREADS threads (keep DB_POOL_SIZE >= WSGI_THREADS).
+
+flask_app = WSGIMiddleware(app, workers=env_int("WSGI_THREADS", 10))
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_engine.dispose() #closes the async connection pool
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] == "http" and await dispatch(scope, receive, send):
+        return
+    await flask_app(scope, receive, send)
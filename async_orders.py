@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+from werkzeug.routing import Map, Rule
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+from sqlalchemy import select, exists, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from marshmallow import ValidationError
+from app import app, Order, Product, orders_products, order_schema, bump_collections, record_sales
+from config import async_engine_options, configure_engine
+from instrumentation import request_metrics, async_statements, SQL_STATEMENTS_HEADER
+from serializers import dumps, format_datetime
+
+
+#==============Async Order Endpoints===============#
+#Checkout traffic (creating orders, adding and removing products) spends most of its time waiting
+#on the database. These handlers serve the same routes and responses as app.py on an asyncio event
+#loop with an async engine, so one process can hold far more requests in flight than it has threads.
+#asgi.py sends these routes here and every other request to the Flask app.
+
+if not app.config['ASYNC_DATABASE_URL']:
+    raise RuntimeError("No async driver for this database, set ASYNC_DATABASE_URL")
+
+async_engine = create_async_engine(app.config['ASYNC_DATABASE_URL'], **async_engine_options(app.config['ASYNC_DATABASE_URL']))
+if async_engine.dialect.name != "sqlite": #aiosqlite connections have no progress handler, so SQLite runs without the timeout here
+    configure_engine(async_engine.sync_engine, app.config['DB_STATEMENT_TIMEOUT_MS'])
+
+Session = async_sessionmaker(async_engine, expire_on_commit=False) #the handlers read ids and dates after commit without reloading
+if app.config['INSTRUMENTATION_ENABLED']:
+    request_metrics.instrument_async(async_engine)
+
+async def fetch_one(query): #runs a lookup on its own connection, so several lookups can be awaited at once
+    async with async_engine.connect() as conn:
+        return (await conn.execute(query)).first()
+
+def record_order_change(session, user_id, order_date, lines, sign=1, orders=0): #the sync summary and version helpers, run through AsyncSession.run_sync()
+    record_sales(user_id, order_date, lines, sign, orders, session=session)
+    bump_collections('orders', f"user_orders:{user_id}", session=session)
+
+#---------------Order Endpoints-----------------#
+#each handler returns (data, status) and is encoded the same way as jsonify() in app.py
+
+async def create_order(body):
+    try:
+        order_data = order_schema.load(body)
+    except ValidationError as err:
+        return err.messages, 400
+    async with Session.begin() as session:
+        new_order = Order(user_id = order_data['user_id'])
+        session.add(new_order)
+        await session.flush() #assigns the id and order date
+        await session.run_sync(record_order_change, new_order.user_id, None, [], orders=1)
+    return {
+        "message": f"Order created successfully",
+        "order_id": new_order.id,
+        "order_date": format_datetime(new_order.order_date)
+    }, 200
+
+async def add_product_to_order(order_id, product_id):
+    #the three lookups don't depend on each other, so they run concurrently on separate connections
+    order, product, in_order = await asyncio.gather(
+        fetch_one(select(Order.user_id, Order.order_date).where(Order.id == order_id)),
+        fetch_one(select(Product.product_name, Product.price).where(Product.id == product_id)),
+        fetch_one(select(exists().where(orders_products.c.order_id == order_id, orders_products.c.product_id == product_id)))
+    )
+    if not order:
+        return {"message": "Invalid order id"}, 400
+    if not product:
+        return {"message": "Invalid product id"}, 400
+    if in_order[0]: #ensures that there are no duplicate items in the order
+        return {"message": f"{product.product_name} is already in the order"}, 400
+    try:
+        async with Session.begin() as session:
+            await session.execute(orders_products.insert().values(order_id = order_id, product_id = product_id, unit_price = product.price))
+            await session.execute(update(Order).where(Order.id == order_id).values(version = Order.version + 1))
+            await session.run_sync(record_order_change, order.user_id, order.order_date, [(product_id, product.price)])
+    except IntegrityError: #a concurrent request added the same product after the lookup
+        return {"message": f"{product.product_name} is already in the order"}, 400
+    return {"message": f"Product {product.product_name} added to order {order_id}"}, 200
+
+async def remove_product(order_id, product_id):
+    order, product, line = await asyncio.gather(
+        fetch_one(select(Order.user_id, Order.order_date).where(Order.id == order_id)),
+        fetch_one(select(Product.product_name).where(Product.id == product_id)),
+        fetch_one(select(orders_products.c.unit_price).where(orders_products.c.order_id == order_id, orders_products.c.product_id == product_id))
+    )
+    if not order:
+        return {"message": "invalid product id"}, 200
+    if not product:
+        return {"message": "invalid product id"}, 200
+    if line is None:
+        return {"message": f"{product.product_name} is not in order {order_id}"}, 400
+    async with Session.begin() as session:
+        removed = await session.execute(delete(orders_products).where(orders_products.c.order_id == order_id, orders_products.c.product_id == product_id))
+        if removed.rowcount == 0: #a concurrent request removed it first, so the summaries were already updated
+            return {"message": f"{product.product_name} is not in order {order_id}"}, 400
+        await session.execute(update(Order).where(Order.id == order_id).values(version = Order.version + 1))
+        await session.run_sync(record_order_change, order.user_id, order.order_date, [(product_id, line.unit_price)], sign=-1)
+    return {"message": f"{product.product_name} has been removed from order {order_id}"}, 200
+
+routes = Map([
+    Rule('/order', methods=['POST'], endpoint=create_order),
+    Rule('/orders/<int:order_id>/add_product/<int:product_id>', methods=['PUT'], endpoint=add_product_to_order),
+    Rule('/orders/<int:order_id>/remove_product/<int:product_id>', methods=['PUT'], endpoint=remove_product),
+])
+
+#---------------ASGI Dispatch-----------------#
+async def read_json(receive): #reads the whole request body and decodes it, None when it isn't valid JSON
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+async def send_json(send, data, status, statements=None):
+    body = dumps(data) + b"\n"
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if statements is not None:
+        headers.append((SQL_STATEMENTS_HEADER.lower().encode(), str(statements).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+async def dispatch(scope, receive, send): #serves the request if it is one of the routes above, returns False otherwise
+    try:
+        rule, args = routes.bind("").match(scope["path"], scope["method"], return_rule=True)
+    except (NotFound, MethodNotAllowed):
+        return False
+    start = time.perf_counter()
+    statements = [0]
+    async_statements.set(statements) #dispatch runs in its own task per request, so the counter is never shared
+    if rule.endpoint is create_order:
+        body = await read_json(receive)
+        data, status = await create_order(body) if body is not None else ({"message": "Request body must be JSON"}, 400)
+    else:
+        data, status = await rule.endpoint(**args)
+    instrumented = app.config['INSTRUMENTATION_ENABLED']
+    await send_json(send, data, status, statements[0] if instrumented else None)
+    if instrumented: #latency and statements go into the same histograms as the Flask routes
+        request_metrics.requests.observe((scope["method"], rule.rule, str(status)), time.perf_counter() - start)
+        request_metrics.statements.observe((scope["method"], rule.rule), statements[0])
+    return True
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+#seed() drops and recreates every table, so the benchmark never uses DATABASE_URL, only its own
+#SEARCH_BENCH_DATABASE_URL (a SQLite file by default)
+os.environ["DATABASE_URL"] = os.environ.get("SEARCH_BENCH_DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.gettempdir(), "ecommerce_search_bench.db")
+os.environ.pop("CACHE_URL", None)
+os.environ.setdefault("INSTRUMENTATION_ENABLED", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, func, select
+from app import app, db, Product
+from migrations import upgrade, metadata as migrations_metadata
+
+
+#==============Search Benchmark===============#
+#Fills the catalog with generated product names, then times GET /products/search for a set of
+#common and rare queries, with and without price filters and sorting.
+#Run with: python benchmarks/bench_search.py [--products 1000000] [--repeat 20] [--json results.json]
+
+BRANDS = ["armani", "levis", "gucci", "prada", "zara", "uniqlo", "nike", "adidas", "puma", "reebok", "diesel", "wrangler", "lee", "guess", "hugo", "boss", "calvin", "klein", "tommy", "ralph",
+          "lauren", "gap", "mango", "asos", "vans", "converse", "fila", "kappa", "umbro", "lacoste"]
+COLORS = ["black", "white", "blue", "navy", "red", "green", "olive", "grey", "brown", "beige", "pink", "purple", "yellow", "orange", "teal", "maroon", "khaki", "cream", "charcoal", "silver"]
+MATERIALS = ["denim", "leather", "cotton", "linen", "wool", "silk", "suede", "canvas", "fleece", "nylon", "cashmere", "corduroy", "velvet", "satin", "jersey"]
+ITEMS = ["jeans", "jacket", "shirt", "trousers", "shorts", "skirt", "dress", "coat", "sweater", "hoodie", "blazer", "vest", "boots", "sneakers", "loafers", "sandals", "belt", "scarf", "hat", "gloves",
+         "socks", "tie", "backpack", "wallet", "watch", "chinos", "cardigan", "parka", "polo", "tee"]
+
+QUERIES = [
+    "q=jeans",
+    "q=jea",
+    "q=blue jeans",
+    "q=armani leather jacket",
+    "q=armani leather jacket&sort=price",
+    "q=denim&min_price=100&max_price=200&sort=-price",
+    "q=cashmere scarf&sort=price",
+    "q=jeans 4242",
+    "q=qwerty",
+    "min_price=10&max_price=20&sort=price",
+    "sort=-price",
+]
+
+def seed(count, seed_value): #recreates the schema with count products, the migrations build the search index
+    rng = random.Random(seed_value)
+    migrations_metadata.drop_all(db.engine)
+    db.drop_all()
+    db.create_all()
+    batch = []
+    for i in range(1, count + 1):
+        name = f"{rng.choice(BRANDS)} {rng.choice(COLORS)} {rng.choice(MATERIALS)} {rng.choice(ITEMS)} {i}" #the number keeps names unique
+        batch.append({"id": i, "product_name": name, "price": round(rng.uniform(1, 1000), 2)})
+        if len(batch) == 10000:
+            db.session.execute(insert(Product), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Product), batch)
+    db.session.commit()
+    upgrade(db.engine)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time product search queries against a generated catalog")
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the catalog from a previous run")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if not args.skip_seed or not db.session.scalar(select(func.count()).select_from(Product)):
+            start = time.perf_counter()
+            seed(args.products, args.seed)
+            print(f"Seeded {args.products} products in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        database = db.engine.dialect.name
+        db.session.remove()
+
+    client = app.test_client()
+    results = []
+    for query in QUERIES:
+        timings = []
+        for index in range(args.repeat):
+            #the extra parameter gives every request its own cache key, so each one reaches the database
+            start = time.perf_counter()
+            response = client.get(f"/products/search?{query}&limit={args.limit}&run={index}")
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        timings.sort()
+        result = {
+            "query": query,
+            "results": len(response.json),
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+            "max_ms": round(timings[-1] * 1000, 3)
+        }
+        results.append(result)
+        print(f"{query:<55} {result['results']:>4} results  p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms")
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"products": args.products, "database": database, "results": results}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
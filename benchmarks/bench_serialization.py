@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+#seed() deletes every user, product and order, so the benchmark never uses DATABASE_URL, only its own
+#SERIALIZATION_BENCH_DATABASE_URL (an in-memory SQLite database by default)
+os.environ["DATABASE_URL"] = os.environ.get("SERIALIZATION_BENCH_DATABASE_URL") or "sqlite://"
+os.environ.pop("CACHE_URL", None)
+os.environ.setdefault("INSTRUMENTATION_ENABLED", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, insert, delete
+from app import app, db, User, Product, Order, users_schema, products_schema, USER_FIELDS, PRODUCT_FIELDS, json_response
+from serializers import rows_to_dicts
+
+
+#==============Serialization Benchmark===============#
+#Compares the Marshmallow read path (ORM objects -> schema.dump -> jsonify) with the fast path
+#(column tuples -> compiled serializer -> orjson) for users, products and orders. The outputs are
+#checked for equal JSON values, the bytes can differ when orjson is installed (see serializers.py).
+#Run with: python benchmarks/bench_serialization.py [--sizes 1000 10000 100000] [--json results.json]
+
+def seed(size): #replaces the table contents with size rows per model
+    db.session.execute(delete(Order))
+    db.session.execute(delete(User))
+    db.session.execute(delete(Product))
+    start_date = datetime(2024, 1, 1)
+    db.session.execute(insert(User), [{"id": i, "name": f"user {i}", "address": f"{i} Main Street", "email": f"user{i}@example.com"} for i in range(1, size + 1)])
+    db.session.execute(insert(Product), [{"id": i, "product_name": f"product {i}", "price": round(i * 0.37, 2)} for i in range(1, size + 1)])
+    db.session.execute(insert(Order), [{"id": i, "user_id": i, "order_date": start_date + timedelta(minutes=i)} for i in range(1, size + 1)])
+    db.session.commit()
+
+#each path returns the response body for the whole table
+def jsonify_bytes(data):
+    return app.json.response(data).get_data()
+
+def marshmallow_users():
+    return jsonify_bytes(users_schema.dump(db.session.execute(select(User)).scalars().all()))
+
+def fast_users():
+    return json_response(rows_to_dicts(db.session.execute(select(*[getattr(User, name) for name in USER_FIELDS])).all())).get_data()
+
+def marshmallow_products():
+    return jsonify_bytes(products_schema.dump(db.session.execute(select(Product)).scalars().all()))
+
+def fast_products():
+    return json_response(rows_to_dicts(db.session.execute(select(*[getattr(Product, name) for name in PRODUCT_FIELDS])).all())).get_data()
+
+def loop_orders(): #the hand-built dict loop the order endpoints used before
+    orders_list = []
+    for order in db.session.query(Order).all():
+        orders_list.append({
+            'id': order.id,
+            'order_date': order.order_date.strftime("%Y-%m-%d %H:%M:%S") if isinstance(order.order_date, datetime) else order.order_date
+        })
+    return jsonify_bytes(orders_list)
+
+def fast_orders():
+    return json_response(rows_to_dicts(db.session.execute(select(Order.id, Order.order_date)).all())).get_data()
+
+CASES = [
+    ("users", marshmallow_users, fast_users),
+    ("products", marshmallow_products, fast_products),
+    ("orders", loop_orders, fast_orders),
+]
+
+#values whose encoding differs between orjson and jsonify, they must still decode the same
+ENCODING_CASES = [
+    {"product_name": "caf\u00e9 cr\u00e8me \u2603", "price": 4.5},
+    {"price": 1e16}, {"price": 1e-05}, {"price": 1.5e-07}, {"price": 1.2345678901234568e+20}, {"price": -0.0}
+]
+
+def measure(function, repeat): #returns (best seconds, peak traced bytes, output)
+    best = float("inf")
+    for _ in range(repeat):
+        db.session.expunge_all() #every run starts with an empty identity map, like a new request
+        start = time.perf_counter()
+        output = function()
+        best = min(best, time.perf_counter() - start)
+    db.session.expunge_all()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, output
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Marshmallow and fast serialization paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with app.app_context():
+        db.create_all()
+        for size in args.sizes:
+            seed(size)
+            for name, baseline, fast in CASES:
+                baseline_seconds, baseline_peak, baseline_output = measure(baseline, args.repeat)
+                fast_seconds, fast_peak, fast_output = measure(fast, args.repeat)
+                result = {
+                    "model": name,
+                    "rows": size,
+                    "equal_json": json.loads(baseline_output) == json.loads(fast_output),
+                    "identical_bytes": baseline_output == fast_output,
+                    "baseline_rows_per_sec": round(size / baseline_seconds),
+                    "fast_rows_per_sec": round(size / fast_seconds),
+                    "speedup": round(baseline_seconds / fast_seconds, 2),
+                    "baseline_peak_mb": round(baseline_peak / 1e6, 2),
+                    "fast_peak_mb": round(fast_peak / 1e6, 2)
+                }
+                results.append(result)
+                print(f"{name:<9} {size:>7} rows  baseline {result['baseline_rows_per_sec']:>9} rows/s {result['baseline_peak_mb']:>8} MB"
+                      f"  fast {result['fast_rows_per_sec']:>9} rows/s {result['fast_peak_mb']:>8} MB"
+                      f"  x{result['speedup']:<6} equal_json={result['equal_json']} identical_bytes={result['identical_bytes']}")
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+    mismatches = [value for value in ENCODING_CASES if json.loads(json_response(value).get_data()) != json.loads(jsonify_bytes(value))]
+    if mismatches:
+        sys.exit(f"fast serializer decodes differently from jsonify for {mismatches}")
+    if not all(result["equal_json"] for result in results):
+        sys.exit("fast serializer output differs from the baseline")
+
+if __name__ == "__main__":
+    main()
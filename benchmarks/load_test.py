@@ -0,0 +1,358 @@
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+#Seeding drops and recreates every table, so the load test never uses DATABASE_URL, only its own
+#LOADTEST_DATABASE_URL (a SQLite file by default), and never the shared cache of a real deployment
+os.environ["DATABASE_URL"] = os.environ.get("LOADTEST_DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.gettempdir(), "ecommerce_loadtest.db")
+os.environ.pop("CACHE_URL", None)
+os.environ.setdefault("INSTRUMENTATION_ENABLED", "1") #queries per request are read from the X-SQL-Statements header
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+from app import app, db, User, Product, Order, orders_products
+from instrumentation import SQL_STATEMENTS_HEADER
+from migrations import upgrade, metadata as migrations_metadata
+
+
+#==============Load Test===============#
+#Replays the requests in Ecommerce_API.postman_collection.json in weighted mixes at a fixed
+#concurrency and reports latency percentiles, throughput and SQL statements per request for each
+#route as JSON. Runs in-process through the Flask test client, or against a server with --url
+#(start the server with DATABASE_URL set to the load test database so the seeded ids exist).
+#
+#  python benchmarks/load_test.py --mix browse --concurrency 8 --duration 30 --output browse.json
+#  python benchmarks/load_test.py --mix checkout --url http://127.0.0.1:8000 --skip-seed
+#  python benchmarks/load_test.py --mix browse --compare browse.json #exits 1 on a regression
+
+COLLECTION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Ecommerce_API.postman_collection.json")
+
+#(collection request name, weight, extra query string)
+MIXES = {
+    "browse": [
+        ("Get Products", 25, ""),
+        ("GET Individual Product", 35, ""),
+        ("GET Individual User", 15, ""),
+        ("Get products in order", 20, ""),
+        ("GET users", 5, "")
+    ],
+    "checkout": [
+        ("Create Order", 20, ""),
+        ("ADD product to order", 50, ""),
+        ("REMOVE product from ORDER", 15, ""),
+        ("Get products in order", 15, "")
+    ],
+    "export": [
+        ("GET users", 1, "stream=1"),
+        ("Get Products", 1, "stream=1"),
+        ("GET Orders", 1, "stream=1")
+    ]
+}
+
+#the collection predates some route changes, these map its paths onto the current routes
+PATH_FIXES = {
+    ("POST", "/orders"): "/order"
+}
+DUMP_ONLY_FIELDS = {"order_date"} #sent by the collection but rejected by OrderSchema on load
+
+#---------------Collection-----------------#
+def load_collection(path): #returns {request name: template} for every request in the collection that matches a route
+    with open(path) as collection_file:
+        items = json.load(collection_file)["item"]
+    adapter = app.url_map.bind("")
+    templates = {}
+    for item in items:
+        request = item["request"]
+        method = request["method"]
+        url = request["url"]["raw"] if isinstance(request["url"], dict) else request["url"]
+        path = re.sub("/+", "/", urlsplit(url).path)
+        path = PATH_FIXES.get((method, path), path)
+        try:
+            rule, args = adapter.match(path, method, return_rule=True)
+        except (NotFound, MethodNotAllowed):
+            print(f"Skipping {item['name']}: no route for {method} {path}", file=sys.stderr)
+            continue
+        raw_body = (request.get("body") or {}).get("raw")
+        templates[item["name"]] = {
+            "method": method,
+            "rule": rule,
+            "body": json.loads(raw_body) if raw_body else None
+        }
+    return templates
+
+def id_kind(rule, arg): #which seeded table a URL argument takes its ids from
+    if arg in ("user_id", "product_id", "order_id"):
+        return arg[:-3] + "s"
+    segment = rule.rule.strip("/").split("/")[0]
+    return {"user": "users", "users": "users", "product": "products", "products": "products", "order": "orders", "orders": "orders"}[segment]
+
+class RequestFactory: #builds concrete requests from a template with random seeded ids and unique names
+    def __init__(self, volumes, seed):
+        self.volumes = volumes
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.counter = 0
+        self.added = [] #(order_id, product_id) pairs this worker added, so removals target real line items
+        self.adapter = app.url_map.bind("")
+
+    def random_id(self, kind):
+        return self.random.randint(1, self.volumes[kind])
+
+    def build(self, template, query):
+        rule = template["rule"]
+        values = {arg: self.random_id(id_kind(rule, arg)) for arg in rule.arguments}
+        if rule.endpoint == "remove_product" and self.added:
+            values = self.added.pop(self.random.randrange(len(self.added)))
+        path = self.adapter.build(rule.endpoint, values, method=template["method"])
+        body = None
+        if template["body"] is not None:
+            self.counter += 1
+            token = f"{self.seed}-{self.counter}"
+            body = {}
+            for name, value in template["body"].items():
+                if name in DUMP_ONLY_FIELDS:
+                    continue
+                if name == "email": #unique columns get a value no other request uses
+                    value = f"load-{token}@example.com"
+                elif name == "product_name":
+                    value = f"{value} {token}"
+                elif name == "user_id":
+                    value = self.random_id("users")
+                elif name == "id":
+                    value = self.random_id(id_kind(rule, "id"))
+                body[name] = value
+        return template["method"], path + (f"?{query}" if query else ""), body, values
+
+    def record(self, template, values, status): #remembers successful additions for later removals
+        if template["rule"].endpoint == "add_product_to_order" and status == 200:
+            self.added.append(values)
+
+#---------------Seeding-----------------#
+SEED_CHUNK_SIZE = 10000
+
+def insert_chunked(table, rows): #executemany in chunks so large volumes don't build one huge statement
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_CHUNK_SIZE:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+
+def seed(volumes, lines_per_order, seed_value): #recreates the schema and fills it, then runs the migrations to build the summary tables
+    rng = random.Random(seed_value)
+    migrations_metadata.drop_all(db.engine)
+    db.drop_all()
+    db.create_all()
+    start = datetime(2024, 1, 1)
+    prices = [round(rng.uniform(1, 500), 2) for _ in range(volumes["products"])]
+    insert_chunked(User, ({"id": i, "name": f"user {i}", "address": f"{i} Main Street", "email": f"user{i}@example.com"} for i in range(1, volumes["users"] + 1)))
+    insert_chunked(Product, ({"id": i, "product_name": f"product {i}", "price": prices[i - 1]} for i in range(1, volumes["products"] + 1)))
+    insert_chunked(Order, ({"id": i, "user_id": rng.randint(1, volumes["users"]), "order_date": start + timedelta(minutes=rng.randint(0, 525600))} for i in range(1, volumes["orders"] + 1)))
+    def lines():
+        for order_id in range(1, volumes["orders"] + 1):
+            for product_id in rng.sample(range(1, volumes["products"] + 1), min(lines_per_order, volumes["products"])):
+                yield {"order_id": order_id, "product_id": product_id, "unit_price": prices[product_id - 1]}
+    insert_chunked(orders_products, lines())
+    db.session.commit()
+    with contextlib.redirect_stdout(sys.stderr): #keeps stdout for the JSON report
+        upgrade(db.engine) #migration 3 rolls the seeded orders up into the sales summary tables
+
+#---------------Clients-----------------#
+class TestClient: #in-process, no server needed
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, body): #returns (status, SQL statements the server ran for it or None)
+        response = self.client.open(path, method=method, json=body)
+        response.get_data() #drains streamed responses so their time is counted
+        response.close()
+        return response.status_code, statement_count(response.headers.get(SQL_STATEMENTS_HEADER))
+
+class HTTPClient: #one keep-alive connection per worker
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+
+    def request(self, method, path, body):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        self.connection.request(method, path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status, statement_count(response.getheader(SQL_STATEMENTS_HEADER))
+
+#every response carries the statement count of the process that served it, so the counts stay right with any number
+#of server workers. Streamed responses, and servers running with INSTRUMENTATION_ENABLED=0, don't send it.
+def statement_count(header):
+    return int(header) if header is not None else None
+
+#---------------Running-----------------#
+def percentile(sorted_values, fraction): #nearest-rank percentile
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))]
+
+def summarize(latencies, statuses, seconds): #latencies in seconds, reported in milliseconds
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / seconds, 2),
+        "errors": sum(count for status, count in statuses.items() if int(status) >= 500),
+        "statuses": dict(sorted(statuses.items())),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None
+    }
+
+def run(templates, mix, make_client, concurrency, duration, max_requests, volumes, seed_value):
+    entries = [(name, weight, query) for name, weight, query in MIXES[mix] if name in templates]
+    labels = [name + (f"?{query}" if query else "") for name, _, query in entries]
+    weights = [weight for _, weight, _ in entries]
+    results = {label: ([], {}, []) for label in labels} #label -> (latencies, status counts, statement counts)
+    lock = threading.Lock()
+    remaining = [max_requests]
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        client = make_client()
+        factory = RequestFactory(volumes, seed_value * 1000 + index) #every worker replays the same sequence on every run
+        latencies = {label: [] for label in labels}
+        statuses = {label: {} for label in labels}
+        statements = {label: [] for label in labels}
+        while time.perf_counter() < deadline:
+            if max_requests:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            choice = factory.random.choices(range(len(entries)), weights)[0]
+            template = templates[entries[choice][0]]
+            method, path, body, values = factory.build(template, entries[choice][2])
+            start = time.perf_counter()
+            status, count = client.request(method, path, body)
+            latencies[labels[choice]].append(time.perf_counter() - start)
+            if count is not None:
+                statements[labels[choice]].append(count)
+            factory.record(template, values, status)
+            status = str(status)
+            statuses[labels[choice]][status] = statuses[labels[choice]].get(status, 0) + 1
+        with lock:
+            for label in labels:
+                results[label][0].extend(latencies[label])
+                results[label][2].extend(statements[label])
+                for status, count in statuses[label].items():
+                    results[label][1][status] = results[label][1].get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for (name, _, query), label in zip(entries, labels):
+        latencies, statuses, statements = results[label]
+        route = summarize(latencies, statuses, elapsed)
+        template = templates[name]
+        route["route"] = f"{template['method']} {template['rule'].rule}"
+        route["queries_per_request"] = round(sum(statements) / len(statements), 2) if statements else None #None when no response sent a count
+        routes[label] = route
+    all_latencies = [latency for latencies, _, _ in results.values() for latency in latencies]
+    all_statuses = {}
+    for _, statuses, _ in results.values():
+        for status, count in statuses.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+    return {"elapsed_seconds": round(elapsed, 3), "totals": summarize(all_latencies, all_statuses, elapsed), "routes": routes}
+
+#---------------Regression Check-----------------#
+def compare(report, baseline, tolerance): #lists the routes that got slower or issue more queries than the baseline allows
+    regressions = []
+    for label, route in report["routes"].items():
+        previous = baseline["routes"].get(label)
+        if not previous:
+            continue
+        for metric in ("p95_ms", "queries_per_request"):
+            if previous.get(metric) and route.get(metric) is not None and route[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{label}: {metric} {previous[metric]} -> {route[metric]}")
+        if previous.get("requests_per_sec") and route["requests_per_sec"] < previous["requests_per_sec"] * (1 - tolerance):
+            regressions.append(f"{label}: requests_per_sec {previous['requests_per_sec']} -> {route['requests_per_sec']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the Postman collection against the API and report latency and throughput")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="browse")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run for")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = run for --duration)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--lines-per-order", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the data from a previous run with the same volumes, its checkout writes are kept")
+    parser.add_argument("--url", help="run against a server instead of the in-process test client")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report, exits 1 if a route regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression against the baseline, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    volumes = {"users": args.users, "products": args.products, "orders": args.orders}
+    templates = load_collection(COLLECTION)
+    with app.app_context():
+        if not args.skip_seed:
+            seed_start = time.perf_counter()
+            seed(volumes, args.lines_per_order, args.seed)
+            print(f"Seeded {volumes} with {args.lines_per_order} products per order in {time.perf_counter() - seed_start:.1f}s", file=sys.stderr)
+        database = db.engine.dialect.name
+        db.session.remove()
+
+    make_client = (lambda: HTTPClient(args.url)) if args.url else TestClient
+    report = {
+        "config": {
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "requests": args.requests,
+            "volumes": dict(volumes, lines_per_order=args.lines_per_order),
+            "seed": args.seed,
+            "target": args.url or "test_client",
+            "database": database,
+            "started_at": datetime.now().isoformat(timespec="seconds")
+        }
+    }
+    report.update(run(templates, args.mix, make_client, args.concurrency, args.duration, args.requests, volumes, args.seed))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+#==============Cache Backends===============#
+#Every backend stores already-serialized JSON bytes under a string key, so a cache hit
+#can be sent straight back to the client without touching the ORM or Marshmallow.
+
+class CacheBackend: #the interface every cache backend has to implement
+    def get(self, key): #returns the cached bytes or None
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None): #stores bytes under key, ttl is in seconds
+        raise NotImplementedError
+
+    def delete(self, *keys): #removes the given keys, missing keys are ignored
+        raise NotImplementedError
+
+    def incr(self, key): #increments an integer counter and returns the new value, counters are never evicted
+        raise NotImplementedError
+
+    def get_counter(self, key): #returns the current value of a counter, 0 if it was never incremented
+        raise NotImplementedError
+
+    def stats(self): #returns hit/miss/eviction counters as a dict
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend): #in-process cache that evicts the least recently used entry once max_entries is reached, for single-process servers only
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() #key -> (expires_at, value), most recently used at the end
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "lru",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class SharedCache(CacheBackend): #cache shared between processes, wraps a Redis-style client (get/set/delete/incr)
+    def __init__(self, client, ttl=60, prefix="ecommerce:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, value, ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + key))
+
+    def get_counter(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "shared",
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": None #evictions happen on the shared server and are reported there
+            }
+
+
+def create_cache(url=None, max_entries=10000, ttl=60): #SharedCache on the Redis server at url, LRUCache when no url is given
+    if not url:
+        return LRUCache(max_entries=max_entries, ttl=ttl)
+    try:
+        import redis #only needed for the shared cache
+    except ImportError:
+        raise RuntimeError("CACHE_URL needs the redis package, pip install redis")
+    return SharedCache(redis.Redis.from_url(url), ttl=ttl)
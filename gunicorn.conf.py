@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+
+#==============Production Server===============#
+#Run with: gunicorn -c gunicorn.conf.py wsgi:app
+#The app is loaded once in the master process (preload) and forked into the workers,
+#each worker then opens its own database connections.
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) #each thread can hold one pooled connection, keep DB_POOL_SIZE >= threads
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000)) #recycles workers to bound memory growth
+max_requests_jitter = max_requests // 10
+
+def on_starting(server): #creates the tables and runs the migrations once, before any worker starts
+    from app import app, db
+    from migrations import upgrade
+    with app.app_context():
+        db.create_all()
+        upgrade(db.engine)
+
+def post_fork(server, worker): #connections opened in the master must not be shared with the forked workers
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,181 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from flask import g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+
+#==============Request Instrumentation===============#
+#Records route, status, latency, SQL statement count, SQL time and serialization time for every
+#request, keeps Prometheus-style histograms of them and writes slow requests to a structured log.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100, 250)
+MAX_LOGGED_STATEMENTS = 50 #statements kept per request for the slow log
+SQL_STATEMENTS_HEADER = "X-SQL-Statements" #statement count sent on every non-streamed response, read by benchmarks/load_test.py
+
+async_statements = contextvars.ContextVar("async_statements", default=None) #[count] for the async request being served
+
+slow_log = logging.getLogger("ecommerce.slow_requests")
+
+
+class Histogram: #cumulative histogram per label set, rendered in the Prometheus text format
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {} #labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.labelnames, labels))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-2]}')
+                lines.append(f"{self.name}_count{{{label_text}}} {series[-2]}")
+                lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]:.6f}")
+        return lines
+
+
+def format_metric(name, metric_type, help_text, value): #renders a single unlabelled gauge or counter
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+
+
+def add_serialization_time(seconds): #adds time spent turning results into JSON to the current request
+    if has_request_context() and "perf" in g:
+        g.perf["serialization_seconds"] += seconds
+
+
+class TimedJSONProvider(DefaultJSONProvider): #Flask JSON provider that counts the time spent in dumps()
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            add_serialization_time(time.perf_counter() - start)
+
+
+class TimedSchemaMixin: #mixed into the Marshmallow schemas so dump() counts as serialization time
+    def dump(self, obj, *, many=None):
+        start = time.perf_counter()
+        try:
+            return super().dump(obj, many=many)
+        finally:
+            add_serialization_time(time.perf_counter() - start)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.slow_request_seconds = 0.5
+        self.requests = Histogram("http_request_duration_seconds", "Total request latency", ("method", "route", "status"), LATENCY_BUCKETS)
+        self.statements = Histogram("http_request_sql_statements", "SQL statements issued per request", ("method", "route"), STATEMENT_BUCKETS)
+        self.sql_time = Histogram("http_request_sql_duration_seconds", "Time spent executing SQL per request", ("method", "route"), LATENCY_BUCKETS)
+        self.serialization_time = Histogram("http_request_serialization_seconds", "Time spent serializing the response per request", ("method", "route"), LATENCY_BUCKETS)
+
+    def init_app(self, app, engine): #registers the request hooks and the SQLAlchemy cursor events
+        self.slow_request_seconds = app.config['SLOW_REQUEST_MS'] / 1000
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def instrument_async(self, engine): #counts the statements of the async order endpoints, see async_orders.dispatch()
+        event.listen(engine.sync_engine, "after_cursor_execute", self._count_async_statement)
+
+    def _count_async_statement(self, conn, cursor, statement, parameters, context, executemany):
+        counter = async_statements.get() #the context variable follows asyncio.gather() tasks and AsyncSession.run_sync()
+        if counter is not None:
+            counter[0] += 1
+
+    def _before_request(self):
+        g.perf = {
+            "start": time.perf_counter(),
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule else "unmatched",
+            "path": request.full_path.rstrip("?"),
+            "status": 500,
+            "streamed": False,
+            "sql_count": 0,
+            "sql_seconds": 0.0,
+            "serialization_seconds": 0.0,
+            "statements": []
+        }
+
+    def _after_request(self, response):
+        perf = g.get("perf")
+        if perf is not None:
+            perf["status"] = response.status_code
+            if response.is_streamed: #a streamed body is still being generated, so the request is finished when the response is closed
+                perf["streamed"] = True
+                response.call_on_close(lambda: self._finish(perf))
+            else: #per response, so a client gets the count of the worker that served it
+                response.headers[SQL_STATEMENTS_HEADER] = str(perf["sql_count"])
+        return response
+
+    def _teardown_request(self, exc):
+        perf = g.get("perf")
+        if perf is not None and not perf["streamed"]:
+            self._finish(perf)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["perf_query_start"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("perf_query_start", None)
+        if start is None or not has_request_context() or "perf" not in g:
+            return #statements outside a request (migrations, startup) aren't counted
+        seconds = time.perf_counter() - start
+        perf = g.perf
+        perf["sql_count"] += 1
+        perf["sql_seconds"] += seconds
+        if len(perf["statements"]) < MAX_LOGGED_STATEMENTS:
+            perf["statements"].append((statement, seconds))
+
+    def _finish(self, perf): #records one finished request in the histograms and the slow log
+        total = time.perf_counter() - perf["start"]
+        method, route = perf["method"], perf["route"]
+        self.requests.observe((method, route, str(perf["status"])), total)
+        self.statements.observe((method, route), perf["sql_count"])
+        self.sql_time.observe((method, route), perf["sql_seconds"])
+        self.serialization_time.observe((method, route), perf["serialization_seconds"])
+        if total >= self.slow_request_seconds:
+            slow_log.warning(json.dumps({
+                "event": "slow_request",
+                "method": method,
+                "route": route,
+                "path": perf["path"],
+                "status": perf["status"],
+                "duration_ms": round(total * 1000, 3),
+                "sql_count": perf["sql_count"],
+                "sql_ms": round(perf["sql_seconds"] * 1000, 3),
+                "serialization_ms": round(perf["serialization_seconds"] * 1000, 3),
+                "statements": [{"sql": statement, "ms": round(seconds * 1000, 3)} for statement, seconds in perf["statements"]]
+            }))
+
+    def render(self): #all request histograms in the Prometheus text format
+        lines = []
+        for histogram in (self.requests, self.statements, self.sql_time, self.serialization_time):
+            lines.extend(histogram.render())
+        return lines
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,161 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Date, Float, Index, inspect, select, insert, update, func, text, literal
+from datetime import datetime
+import pytz
+from search import search_terms
+
+
+#==============Schema Migrations===============#
+#Each migration runs once per database, in order, and its version is recorded in schema_migrations.
+#Migrations reflect the tables they touch instead of importing the models from app.py, so they keep
+#working after the models change. Every step checks first, so running them against a database made
+#by db.create_all() only records the versions.
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+def reflect(conn, name): #loads the current definition of a table from the database
+    return Table(name, MetaData(), autoload_with=conn)
+
+def create_index(conn, table_name, index_name, columns, unique=False): #creates an index unless one with the same name already exists
+    if index_name in {index["name"] for index in inspect(conn).get_indexes(table_name)}:
+        return
+    table = reflect(conn, table_name)
+    Index(index_name, *[table.c[column] for column in columns], unique=unique).create(conn)
+
+#---------------Migrations-----------------#
+#1: version and updated_at columns used for ETags, and the collection_versions table
+def add_versioning_columns(conn):
+    now = datetime.now(pytz.utc).replace(tzinfo=None)
+    for table_name in ("users", "products", "orders"):
+        columns = {column["name"] for column in inspect(conn).get_columns(table_name)}
+        if "version" not in columns:
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+        if "updated_at" not in columns:
+            #SQLite only accepts constant defaults in ADD COLUMN, so existing rows get the current time in a second step
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN updated_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00'"))
+            conn.execute(update(reflect(conn, table_name)).values(updated_at=now))
+    Table(
+        "collection_versions",
+        MetaData(),
+        Column("name", String(60), primary_key=True),
+        Column("version", Integer, nullable=False),
+        Column("updated_at", DateTime, nullable=False)
+    ).create(conn, checkfirst=True)
+
+#2: unique indexes for the duplicate checks and secondary indexes for the hot lookups
+def add_lookup_indexes(conn):
+    for table_name, column in (("users", "email"), ("products", "product_name")):
+        table = reflect(conn, table_name)
+        duplicates = conn.execute(select(table.c[column]).group_by(table.c[column]).having(func.count() > 1).limit(10)).scalars().all()
+        if duplicates: #a unique index can't be built until these rows are cleaned up by hand
+            raise RuntimeError(f"Cannot add a unique index on {table_name}.{column}, duplicate values: {', '.join(map(str, duplicates))}")
+    create_index(conn, "users", "ix_users_email", ["email"], unique=True)
+    create_index(conn, "products", "ix_products_product_name", ["product_name"], unique=True)
+    create_index(conn, "orders_products", "ix_orders_products_product_id", ["product_id"])
+    create_index(conn, "orders", "ix_orders_user_id_order_date", ["user_id", "order_date"])
+
+#3: unit_price on line items and the incrementally maintained sales summary tables
+def add_sales_summaries(conn):
+    if "unit_price" not in {column["name"] for column in inspect(conn).get_columns("orders_products")}:
+        conn.execute(text("ALTER TABLE orders_products ADD COLUMN unit_price FLOAT"))
+    orders_products = reflect(conn, "orders_products")
+    products = reflect(conn, "products")
+    orders = reflect(conn, "orders")
+    #existing line items are priced at the current product price, the best record available
+    conn.execute(update(orders_products).where(orders_products.c.unit_price.is_(None)).values(
+        unit_price=select(products.c.price).where(products.c.id == orders_products.c.product_id).scalar_subquery()
+    ))
+
+    summary = MetaData()
+    user_spend = Table(
+        "user_spend",
+        summary,
+        Column("user_id", Integer, primary_key=True, autoincrement=False),
+        Column("orders", Integer, nullable=False),
+        Column("items", Integer, nullable=False),
+        Column("total_spent", Float(8), nullable=False)
+    )
+    product_sales_daily = Table(
+        "product_sales_daily",
+        summary,
+        Column("product_id", Integer, primary_key=True, autoincrement=False),
+        Column("sales_date", Date, primary_key=True),
+        Column("units", Integer, nullable=False),
+        Column("revenue", Float(8), nullable=False)
+    )
+    summary.create_all(conn, checkfirst=True)
+
+    #one-time rollup of the order history, skipped when the tables already hold data
+    if conn.execute(select(func.count()).select_from(user_spend)).scalar() == 0:
+        conn.execute(insert(user_spend).from_select(
+            ["user_id", "orders", "items", "total_spent"],
+            select(orders.c.user_id, func.count(), literal(0), literal(0.0)).group_by(orders.c.user_id)
+        ))
+        lines = select(orders.c.user_id, orders_products.c.unit_price).join(orders, orders.c.id == orders_products.c.order_id).subquery()
+        conn.execute(update(user_spend).values(
+            items=select(func.count()).where(lines.c.user_id == user_spend.c.user_id).scalar_subquery(),
+            total_spent=select(func.coalesce(func.sum(lines.c.unit_price), 0)).where(lines.c.user_id == user_spend.c.user_id).scalar_subquery()
+        ))
+    if conn.execute(select(func.count()).select_from(product_sales_daily)).scalar() == 0:
+        sales_date = func.date(orders.c.order_date)
+        conn.execute(insert(product_sales_daily).from_select(
+            ["product_id", "sales_date", "units", "revenue"],
+            select(orders_products.c.product_id, sales_date, func.count(), func.coalesce(func.sum(orders_products.c.unit_price), 0))
+            .join(orders, orders.c.id == orders_products.c.order_id)
+            .group_by(orders_products.c.product_id, sales_date)
+        ))
+
+#4: product search, a FULLTEXT index on MySQL and the product_search_terms inverted index everywhere else
+def add_product_search(conn):
+    create_index(conn, "products", "ix_products_price_id", ["price", "id"])
+    product_search_terms = Table(
+        "product_search_terms",
+        MetaData(),
+        Column("term", String(60), primary_key=True),
+        Column("product_id", Integer, primary_key=True, autoincrement=False),
+        Index("ix_product_search_terms_product_id_term", "product_id", "term")
+    )
+    product_search_terms.create(conn, checkfirst=True)
+    if conn.dialect.name == "mysql":
+        if "ix_products_product_name_fulltext" not in {index["name"] for index in inspect(conn).get_indexes("products")}:
+            conn.execute(text("CREATE FULLTEXT INDEX ix_products_product_name_fulltext ON products (product_name)"))
+        return
+    if conn.execute(select(func.count()).select_from(product_search_terms)).scalar() > 0:
+        return
+    products = reflect(conn, "products")
+    for chunk in conn.execution_options(yield_per=10000).execute(select(products.c.id, products.c.product_name)).partitions():
+        rows = [{"term": term, "product_id": id} for id, name in chunk for term in search_terms(name)]
+        if rows:
+            conn.execute(insert(product_search_terms), rows)
+
+MIGRATIONS = [
+    (1, "add version and updated_at columns", add_versioning_columns),
+    (2, "add unique and lookup indexes", add_lookup_indexes),
+    (3, "add line item prices and sales summary tables", add_sales_summaries),
+    (4, "add product search indexes", add_product_search),
+]
+
+def upgrade(engine): #applies every migration that hasn't run on this database yet, each in its own transaction
+    metadata.create_all(engine, tables=[schema_migrations])
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.now(pytz.utc).replace(tzinfo=None)))
+        print(f"Applied migration {version}: {name}")
+
+#Run the migrations against the database configured in app.py
+if __name__ == "__main__":
+    from app import app, db
+    with app.app_context():
+        upgrade(db.engine)
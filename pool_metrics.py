@@ -0,0 +1,91 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+#==============Connection Pool Metrics===============#
+#Tracks how long requests wait for a connection, how close the pool is to its limit and how
+#often connections are opened and closed. One PoolMetrics instance is shared by the process.
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.engine = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_checked_out = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.invalidations = 0
+
+    def record_wait(self, seconds): #called by TimedQueuePool every time a connection is handed out
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def instrument(self, engine): #registers the pool event listeners, they stay attached when the pool is recreated
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "close_detached", self._on_close)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_close(self, dbapi_connection, *args):
+        with self._lock:
+            self.connections_closed += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checkouts - self.checkins)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self): #returns a snapshot of the counters and the current pool state
+        pool = self.engine.pool if self.engine is not None else None
+        capacity = None
+        if isinstance(pool, QueuePool) and pool._max_overflow >= 0: #a negative max_overflow means the pool has no upper limit
+            capacity = pool.size() + pool._max_overflow
+        with self._lock:
+            checked_out = self.checkouts - self.checkins
+            return {
+                "pool": type(pool).__name__ if pool is not None else None,
+                "size": pool.size() if isinstance(pool, QueuePool) else None,
+                "capacity": capacity,
+                "checked_out": checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "saturation": round(checked_out / capacity, 4) if capacity else None,
+                "checkouts": self.checkouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "connections_opened": self.connections_opened,
+                "connections_closed": self.connections_closed,
+                "invalidations": self.invalidations
+            }
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool): #QueuePool that reports how long each checkout waited for a free connection
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
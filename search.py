@@ -0,0 +1,88 @@
+import re
+import threading
+from collections import OrderedDict
+from itertools import compress
+
+
+#==============Product Search===============#
+#MySQL searches product names with its FULLTEXT index. Other databases use the product_search_terms
+#table, an inverted index with one row per (word, product). Each query word matches any indexed word
+#it is a prefix of, which is a range scan on the table's primary key.
+
+MAX_TERM_LENGTH = 60 #same as the product_name column, so a term never needs truncating in practice
+WORD = re.compile(r"\w+")
+
+def search_terms(text): #the distinct lower-cased words of a product name or a query
+    return sorted({word[:MAX_TERM_LENGTH] for word in WORD.findall(text.lower())})
+
+def prefix_range(term): #(low, high) such that low <= word < high holds for every word starting with term
+    return term, term[:-1] + chr(ord(term[-1]) + 1)
+
+def fulltext_query(terms): #MySQL boolean mode query requiring every term as a word prefix
+    return " ".join(f"+{term}*" for term in terms)
+
+#The product ids matching a word are kept as a bitmap (a Python int with bit id set), so a query with
+#several common words is one AND of a few bitmaps instead of a join over tens of thousands of postings.
+
+def ids_to_bitmap(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for id in ids:
+        bits[id >> 3] |= 1 << (id & 7)
+    return int.from_bytes(bits, "little")
+
+def bitmap_ids(bitmap): #the ids in a bitmap in ascending order
+    size = (bitmap.bit_length() + 63) // 64
+    words = memoryview(bitmap.to_bytes(size * 8, "little")).cast("Q")
+    ids = []
+    for index in compress(range(size), words): #skips the empty 64-bit words in C instead of testing every bit
+        word, base = words[index], index * 64
+        while word:
+            lowest = word & -word
+            ids.append(base + lowest.bit_length() - 1)
+            word ^= lowest
+    return ids
+
+class BitmapSet: #O(1) membership test on a bitmap, shifting a big int per lookup would copy it every time
+    def __init__(self, bitmap):
+        self.data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+
+    def __contains__(self, id):
+        index = id >> 3
+        return index < len(self.data) and self.data[index] >> (id & 7) & 1 == 1
+
+
+class TermBitmaps: #per-process cache of word bitmaps, emptied whenever the products collection version changes
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.version = None
+        self._bitmaps = OrderedDict() #term -> bitmap, most recently used at the end
+        self._lock = threading.Lock()
+
+    def get(self, version, term, load): #returns the bitmap of term at version, load(term) returns the matching ids on a miss
+        with self._lock:
+            if version != self.version: #a product was written since the bitmaps were built
+                self._bitmaps.clear()
+                self.version = version
+            bitmap = self._bitmaps.get(term)
+            if bitmap is not None:
+                self._bitmaps.move_to_end(term)
+                return bitmap
+        bitmap = ids_to_bitmap(load(term))
+        with self._lock:
+            if version == self.version:
+                self._bitmaps[term] = bitmap
+                while len(self._bitmaps) > self.max_entries:
+                    self._bitmaps.popitem(last=False)
+        return bitmap
+
+    def match(self, version, terms, load): #bitmap of the products matching every term
+        bitmaps = sorted((self.get(version, term, load) for term in terms), key=int.bit_count)
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            if not result:
+                break
+            result &= bitmap
+        return result
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import pytest
+
+#The tests run against a SQLite file of their own, never the DATABASE_URL of the shell
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="ecommerce_tests_"), "test.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + DATABASE_PATH
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("CACHE_URL", None)
+os.environ["INSTRUMENTATION_ENABLED"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from app import app, db
+from cache import LRUCache
+from search import TermBitmaps
+
+
+@pytest.fixture
+def cache(monkeypatch): #a fresh cache for every test, so hits and misses only count that test's requests
+    cache = LRUCache(max_entries=100, ttl=60)
+    monkeypatch.setattr(app_module, "cache", cache)
+    return cache
+
+@pytest.fixture
+def client(cache, monkeypatch): #empty tables, a fresh cache and no word bitmaps, the recreated tables start their versions over
+    monkeypatch.setattr(app_module, "term_bitmaps", TermBitmaps())
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.remove()
+    yield app.test_client()
+    with app.app_context():
+        db.session.remove()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import pytest
+
+#the async endpoints need the packages listed in requirements.txt, skip instead of failing collection without them
+pytest.importorskip("a2wsgi")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from asgi import application
+from async_orders import async_engine
+
+
+async def call(method, path, body=None): #sends one request through the ASGI app, returns (status, decoded JSON body)
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http", "path": path,
+             "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+             "client": ("127.0.0.1", 50000), "server": ("testserver", 80)}
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b"", "more_body": False}]
+    sent = []
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    async def send(message):
+        sent.append(message)
+    await application(scope, receive, send)
+    status = next(message["status"] for message in sent if message["type"] == "http.response.start")
+    data = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return status, json.loads(data)
+
+def run(*requests): #runs the requests concurrently on a new event loop, every loop gets its own async connections
+    async def main():
+        try:
+            return await asyncio.gather(*[call(*request) for request in requests])
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+def seed(client): #one user with an empty order, and two products
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    client.post('/products', json={"product_name": "shirt", "price": 10})
+    client.post('/products', json={"product_name": "hat", "price": 5})
+    [(status, data)] = run(("POST", "/order", {"user_id": 1}))
+    assert status == 200
+    return data["order_id"]
+
+def test_create_order(client):
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    [(status, data)] = run(("POST", "/order", {"user_id": 1}))
+    assert status == 200
+    assert data["message"] == "Order created successfully"
+    assert data["order_id"] == 1
+    assert data["order_date"]
+    assert run(("POST", "/order", {}))[0][0] == 400
+    assert client.get('/users/1/spend').json["orders"] == 1
+
+def test_concurrent_duplicate_add(client):
+    order_id = seed(client)
+    results = run(*[("PUT", f"/orders/{order_id}/add_product/1")] * 5)
+    assert sorted(status for status, _ in results) == [200, 400, 400, 400, 400]
+    assert client.get(f'/orders/{order_id}/total').json == {"order_id": order_id, "items": 1, "total": 10.0}
+    assert client.get('/users/1/spend').json == {"user_id": 1, "orders": 1, "items": 1, "total_spent": 10.0}
+
+def test_remove_twice(client):
+    order_id = seed(client)
+    run(("PUT", f"/orders/{order_id}/add_product/1"), ("PUT", f"/orders/{order_id}/add_product/2"))
+    [(first, _)] = run(("PUT", f"/orders/{order_id}/remove_product/1"))
+    [(second, data)] = run(("PUT", f"/orders/{order_id}/remove_product/1"))
+    assert (first, second) == (200, 400)
+    assert data == {"message": f"shirt is not in order {order_id}"}
+    assert client.get('/users/1/spend').json == {"user_id": 1, "orders": 1, "items": 1, "total_spent": 5.0}
+    top = client.get('/analytics/top_products').json["products"]
+    assert [(product["id"], product["units"]) for product in top] == [(2, 1)]
+
+def test_flask_routes_are_served_through_asgi(client):
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    [(status, data)] = run(("GET", "/user/1"))
+    assert status == 200
+    assert data["email"] == "ann@example.com"
@@ -0,0 +1,78 @@
+def users(*emails):
+    return [{"name": email.split("@")[0], "address": "1 Main St", "email": email} for email in emails]
+
+def stored_emails(client):
+    return {user["id"]: user["email"] for user in client.get('/users').json}
+
+#---------------Bulk create-----------------#
+def test_bulk_create_statuses(client):
+    response = client.post('/users/bulk', json=users("ann@example.com", "bob@example.com"))
+    assert (response.status_code, response.json) == (201, {"created": 2, "errors": {}})
+    response = client.post('/users/bulk', json=users("ann@example.com", "cat@example.com", "cat@example.com"))
+    assert response.status_code == 201
+    assert response.json == {"created": 1, "errors": {
+        "0": {"email": ["User with email ann@example.com already exists"]},
+        "2": {"email": ["User with email cat@example.com already exists"]}
+    }}
+    response = client.post('/users/bulk', json=users("bob@example.com"))
+    assert (response.status_code, response.json["created"]) == (400, 0)
+    assert client.post('/users/bulk', json={"email": "dan@example.com"}).status_code == 400
+    assert sorted(stored_emails(client).values()) == ["ann@example.com", "bob@example.com", "cat@example.com"]
+
+#---------------Bulk update-----------------#
+def test_bulk_update_collision_with_an_existing_row(client):
+    client.post('/users/bulk', json=users("ann@example.com", "bob@example.com", "cat@example.com"))
+    response = client.put('/users/bulk', json=[
+        {"id": 1, "name": "ann", "address": "1 Main St", "email": "bob@example.com"}, #bob still has it
+        {"id": 3, "name": "cat", "address": "1 Main St", "email": "cat@example.org"}
+    ])
+    assert response.status_code == 200
+    assert response.json == {"updated": 1, "errors": {"0": {"email": ["User with email bob@example.com already exists"]}}}
+    assert stored_emails(client) == {1: "ann@example.com", 2: "bob@example.com", 3: "cat@example.org"}
+
+def test_bulk_update_keeping_its_own_value(client):
+    client.post('/users/bulk', json=users("ann@example.com"))
+    response = client.put('/users/bulk', json=[{"id": 1, "name": "ann", "address": "2 Main St", "email": "ann@example.com"}])
+    assert (response.status_code, response.json) == (200, {"updated": 1, "errors": {}})
+    assert client.get('/user/1').json["address"] == "2 Main St"
+
+def test_bulk_update_collision_inside_the_batch(client):
+    client.post('/users/bulk', json=users("ann@example.com", "bob@example.com"))
+    response = client.put('/users/bulk', json=[
+        {"id": 1, "name": "ann", "address": "1 Main St", "email": "new@example.com"},
+        {"id": 2, "name": "bob", "address": "1 Main St", "email": "new@example.com"}, #taken by the item above
+        {"id": 2, "name": "bob", "address": "1 Main St", "email": "ann@example.com"} #ann's old email, still hers when the batch is checked
+    ])
+    assert response.status_code == 200
+    assert response.json == {"updated": 1, "errors": {
+        "1": {"email": ["User with email new@example.com already exists"]},
+        "2": {"email": ["User with email ann@example.com already exists"]}
+    }}
+    assert stored_emails(client) == {1: "new@example.com", 2: "bob@example.com"}
+
+def test_bulk_update_invalid_and_repeated_ids(client):
+    client.post('/users/bulk', json=users("ann@example.com", "bob@example.com"))
+    response = client.put('/users/bulk', json=[
+        {"id": 1, "name": "ann", "address": "2 Main St", "email": "ann@example.com"},
+        {"id": 1, "name": "ann", "address": "3 Main St", "email": "ann@example.com"},
+        {"id": 99, "name": "zed", "address": "1 Main St", "email": "zed@example.com"},
+        {"name": "bob", "address": "1 Main St", "email": "bob@example.com"}
+    ])
+    assert response.status_code == 200
+    assert response.json == {"updated": 1, "errors": {
+        "1": {"id": ["user id 1 appears more than once"]},
+        "2": {"id": ["Invalid user id"]},
+        "3": {"id": ["Missing data for required field."]}
+    }}
+    assert client.get('/user/1').json["address"] == "2 Main St"
+
+def test_bulk_update_statuses(client):
+    client.post('/products/bulk', json=[{"product_name": "shirt", "price": 10}, {"product_name": "hat", "price": 5}])
+    response = client.put('/products/bulk', json=[{"id": 1, "product_name": "shirt", "price": 12}])
+    assert (response.status_code, response.json) == (200, {"updated": 1, "errors": {}})
+    response = client.put('/products/bulk', json=[{"id": 1, "product_name": "hat", "price": 12}, {"id": 7, "product_name": "cap", "price": 1}])
+    assert (response.status_code, response.json["updated"]) == (400, 0)
+    assert client.put('/products/bulk', json={"id": 1}).status_code == 400
+    response = client.put('/products/bulk', json=[{"id": 2, "product_name": "hat", "price": "free"}])
+    assert (response.status_code, list(response.json["errors"])) == (400, ["0"])
+    assert [(product["product_name"], product["price"]) for product in client.get('/products').json] == [("shirt", 12.0), ("hat", 5.0)]
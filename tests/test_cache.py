@@ -0,0 +1,201 @@
+import sys
+import types
+import pytest
+import cache as cache_module
+from cache import LRUCache, SharedCache, create_cache
+from app import app, entry_key, cache_response, json_response
+
+
+class FakeRedis: #stand-in for a redis.Redis client, keeps values in a dict and records the expiry of each set()
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiry[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode() #Redis returns stored counters as bytes
+        return int(self.values[key])
+
+
+@pytest.fixture
+def clock(monkeypatch): #controls time.monotonic() inside cache.py
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+#---------------LRUCache-----------------#
+def test_lru_get_and_set():
+    cache = LRUCache(max_entries=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", b"1")
+    assert cache.get("a") == b"1"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_lru_entries_expire_after_ttl(clock):
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2", ttl=120)
+    clock[0] += 60
+    assert cache.get("a") is None
+    assert cache.get("b") == b"2"
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 1
+
+def test_lru_ttl_zero_never_expires(clock):
+    cache = LRUCache(max_entries=10, ttl=0)
+    cache.set("a", b"1")
+    clock[0] += 10 ** 6
+    assert cache.get("a") == b"1"
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a") #b is now the least recently used
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert cache.stats()["evictions"] == 1
+
+def test_lru_delete_ignores_missing_keys():
+    cache = LRUCache()
+    cache.set("a", b"1")
+    cache.delete("a", "missing")
+    assert cache.get("a") is None
+
+def test_lru_counters_are_never_evicted():
+    cache = LRUCache(max_entries=1)
+    assert cache.get_counter("version") == 0
+    assert cache.incr("version") == 1
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.incr("version") == 2
+    assert cache.get_counter("version") == 2
+
+#---------------SharedCache-----------------#
+def test_shared_cache_prefixes_keys_and_passes_ttl():
+    client = FakeRedis()
+    cache = SharedCache(client, ttl=30, prefix="test:")
+    cache.set("a", b"1")
+    cache.set("b", b"2", ttl=5)
+    assert client.values == {"test:a": b"1", "test:b": b"2"}
+    assert client.expiry == {"test:a": 30, "test:b": 5}
+    assert cache.get("a") == b"1"
+
+def test_shared_cache_ttl_zero_sets_no_expiry():
+    client = FakeRedis()
+    SharedCache(client, ttl=0).set("a", b"1")
+    assert client.expiry == {"ecommerce:a": None}
+
+def test_shared_cache_counts_hits_and_misses():
+    cache = SharedCache(FakeRedis())
+    cache.set("a", b"1")
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["backend"], stats["hits"], stats["misses"]) == ("shared", 1, 1)
+
+def test_shared_cache_delete_and_counters():
+    cache = SharedCache(FakeRedis())
+    cache.set("a", b"1")
+    cache.delete("a", "missing")
+    cache.delete()
+    assert cache.get("a") is None
+    assert cache.get_counter("version") == 0
+    assert cache.incr("version") == 1
+    assert cache.incr("version") == 2
+    assert cache.get_counter("version") == 2
+
+def test_create_cache_without_url_is_lru():
+    cache = create_cache(None, max_entries=5, ttl=10)
+    assert isinstance(cache, LRUCache)
+    assert (cache.max_entries, cache.ttl) == (5, 10)
+
+def test_create_cache_with_url_is_shared(monkeypatch):
+    urls = []
+    def from_url(url):
+        urls.append(url)
+        return FakeRedis()
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=from_url)))
+    cache = create_cache("redis://localhost:6379/0", ttl=10)
+    assert isinstance(cache, SharedCache)
+    assert urls == ["redis://localhost:6379/0"]
+    assert cache.ttl == 10
+
+#---------------Invalidation-----------------#
+def test_product_is_served_from_cache(client, cache):
+    client.post('/products', json={"product_name": "shirt", "price": 10})
+    first = client.get('/product/1')
+    second = client.get('/product/1')
+    assert first.get_data() == second.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert cache.stats()["hits"] == 1
+
+def test_update_product_invalidates(client):
+    client.post('/products', json={"product_name": "shirt", "price": 10})
+    client.get('/product/1')
+    client.put('/product/1', json={"product_name": "shirt", "price": 12})
+    assert client.get('/product/1').json["price"] == 12
+
+def test_delete_product_invalidates(client):
+    client.post('/products', json={"product_name": "shirt", "price": 10})
+    client.get('/product/1')
+    client.delete('/product/1')
+    assert client.get('/product/1').json == {}
+
+def test_update_user_invalidates(client):
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    client.get('/user/1')
+    client.put('/users/1', json={"name": "ann", "address": "2 Main St", "email": "ann@example.com"})
+    assert client.get('/user/1').json["address"] == "2 Main St"
+
+def test_delete_user_invalidates(client):
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    client.get('/user/1')
+    client.delete('/user/1')
+    assert client.get('/user/1').json == {}
+
+def test_bulk_update_users_invalidates(client):
+    client.post('/users/bulk', json=[{"name": "ann", "address": "1 Main St", "email": "ann@example.com"}])
+    client.get('/user/1')
+    client.put('/users/bulk', json=[{"id": 1, "name": "ann", "address": "2 Main St", "email": "ann@example.com"}])
+    assert client.get('/user/1').json["address"] == "2 Main St"
+
+def test_bulk_update_products_invalidates_products_and_listings(client):
+    client.post('/products/bulk', json=[{"product_name": "shirt", "price": 10}])
+    client.get('/product/1')
+    client.get('/products')
+    client.get('/products/search?q=shirt')
+    client.put('/products/bulk', json=[{"id": 1, "product_name": "shirt", "price": 12}])
+    assert client.get('/product/1').json["price"] == 12
+    assert client.get('/products').json[0]["price"] == 12
+    assert client.get('/products/search?q=shirt').json[0]["price"] == 12
+
+def test_product_writes_invalidate_listings(client):
+    client.post('/products', json={"product_name": "shirt", "price": 10})
+    assert len(client.get('/products').json) == 1
+    client.post('/products/bulk', json=[{"product_name": "hat", "price": 5}])
+    assert len(client.get('/products').json) == 2
+    client.delete('/product/1')
+    assert [product["product_name"] for product in client.get('/products').json] == ["hat"]
+
+def test_fill_that_raced_with_an_update_is_never_served(client):
+    client.post('/products', json={"product_name": "shirt", "price": 10})
+    with app.test_request_context():
+        key = entry_key("product", 1) #a read that loaded the product before the update below
+    client.put('/product/1', json={"product_name": "shirt", "price": 12})
+    with app.test_request_context():
+        cache_response(key, json_response({"id": 1, "price": 10.0, "product_name": "shirt"}))
+    assert client.get('/product/1').json["price"] == 12
@@ -0,0 +1,16 @@
+from werkzeug.http import http_date
+from app import utc_now
+
+
+def test_etag_answers_304(client):
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    etag = client.get('/users').headers['ETag']
+    assert client.get('/users', headers={"If-None-Match": etag}).status_code == 304
+
+def test_if_modified_since_in_the_second_of_a_write_is_not_304(client):
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    since = http_date(utc_now()) #what a client polling right after the first write would send
+    client.post('/users', json={"name": "bob", "address": "2 Main St", "email": "bob@example.com"})
+    response = client.get('/users', headers={"If-Modified-Since": since})
+    assert response.status_code == 200
+    assert len(response.json) == 2
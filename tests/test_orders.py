@@ -0,0 +1,61 @@
+from sqlalchemy import event
+from app import app, db
+
+
+def seed(client): #one user with an empty order, and two products
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    client.post('/products/bulk', json=[{"product_name": "shirt", "price": 10}, {"product_name": "hat", "price": 5}])
+    return client.post('/order', json={"user_id": 1}).json["order_id"]
+
+def test_add_products(client):
+    order_id = seed(client)
+    response = client.put(f'/orders/{order_id}/add_products', json={"product_ids": [1, 3, 1]})
+    assert response.status_code == 200
+    assert response.json == {"added": 1, "errors": {"1": {"product_id": ["Invalid product id"]}, "2": {"product_id": ["Product 1 is already in the order"]}}}
+    response = client.put(f'/orders/{order_id}/add_products', json={"product_ids": [1]})
+    assert response.status_code == 400
+    assert client.get('/users/1/spend').json == {"user_id": 1, "orders": 1, "items": 1, "total_spent": 10.0}
+
+def test_add_products_raced_by_a_concurrent_add(client):
+    order_id = seed(client)
+    def add_first(conn, cursor, statement, parameters, context, executemany): #another request adds product 1 between the lookup and the insert
+        if statement.startswith("INSERT INTO orders_products"):
+            cursor.connection.execute("INSERT INTO orders_products (order_id, product_id, unit_price) VALUES (?, 1, 10)", (order_id,))
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", add_first)
+    try:
+        response = client.put(f'/orders/{order_id}/add_products', json={"product_ids": [1, 2]})
+    finally:
+        event.remove(engine, "before_cursor_execute", add_first)
+    assert response.status_code == 409
+    assert response.json["message"] == "Product added to the order by a concurrent request, nothing was added"
+    #the sales summaries were rolled back with the line items
+    assert client.get('/users/1/spend').json == {"user_id": 1, "orders": 1, "items": 0, "total_spent": 0.0}
+    assert client.get(f'/orders/{order_id}/total').json == {"order_id": order_id, "items": 0, "total": 0.0}
+    assert client.get('/analytics/top_products').json["products"] == []
+
+def test_delete_product_takes_its_sales_back_out(client):
+    client.post('/users/bulk', json=[{"name": "ann", "address": "1 Main St", "email": "ann@example.com"}, {"name": "bob", "address": "2 Main St", "email": "bob@example.com"}])
+    client.post('/products/bulk', json=[{"product_name": "shirt", "price": 10}, {"product_name": "hat", "price": 5}])
+    orders = {user_id: [client.post('/order', json={"user_id": user_id}).json["order_id"] for _ in range(2)] for user_id in (1, 2)} #all on the same day
+    client.put(f'/orders/{orders[1][0]}/add_products', json={"product_ids": [1, 2]})
+    client.put(f'/orders/{orders[1][1]}/add_product/1')
+    client.put('/product/1', json={"product_name": "shirt", "price": 12}) #the lines below are sold at the new price
+    client.put(f'/orders/{orders[2][0]}/add_product/1')
+    client.put(f'/orders/{orders[2][1]}/add_products', json={"product_ids": [2, 1]})
+    client.put(f'/orders/{orders[1][1]}/remove_product/1') #removed at the price it was added for
+    assert client.get('/analytics/top_products').json["products"] == [
+        {"id": 1, "name": "shirt", "units": 3, "revenue": 34.0},
+        {"id": 2, "name": "hat", "units": 2, "revenue": 10.0}
+    ]
+
+    assert client.delete('/product/1').status_code == 200
+    totals = {user_id: [client.get(f'/orders/{order_id}/total').json for order_id in order_ids] for user_id, order_ids in orders.items()}
+    assert [(total["items"], total["total"]) for total in totals[1] + totals[2]] == [(1, 5.0), (0, 0.0), (0, 0.0), (1, 5.0)]
+    for user_id, user_totals in totals.items(): #the spend summary matches the orders it sums up
+        assert client.get(f'/users/{user_id}/spend').json == {
+            "user_id": user_id, "orders": 2, "items": sum(total["items"] for total in user_totals), "total_spent": sum(total["total"] for total in user_totals)
+        }
+    assert client.get('/analytics/top_products').json["products"] == [{"id": 2, "name": "hat", "units": 2, "revenue": 10.0}]
+    assert client.get('/analytics/top_products?by=revenue').json["products"] == [{"id": 2, "name": "hat", "units": 2, "revenue": 10.0}]
@@ -0,0 +1,129 @@
+import pytest
+import app as app_module
+from app import app, db, ProductSearchTerm
+from search import ids_to_bitmap, bitmap_ids, BitmapSet, TermBitmaps
+from sqlalchemy import select
+
+
+def names(response):
+    return [product["product_name"] for product in response.json]
+
+def search(client, query):
+    response = client.get(f'/products/search?{query}')
+    assert response.status_code == 200
+    return names(response)
+
+def all_pages(client, query, limit=3): #follows X-Next-Cursor to the last page, returns every product name in order
+    found, cursor = [], None
+    while True:
+        response = client.get(f'/products/search?{query}&limit={limit}' + (f'&after={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        found.extend(names(response))
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return found
+
+def stored_terms():
+    with app.app_context():
+        return sorted(tuple(row) for row in db.session.execute(select(ProductSearchTerm.product_id, ProductSearchTerm.term)))
+
+@pytest.fixture(params=["lookup", "index walk", "bitmap walk"])
+def strategy(request, monkeypatch): #forces each of the ways search_rows() turns the matching ids into a sorted page
+    if request.param == "lookup":
+        monkeypatch.setattr(app_module, "SEARCH_LOOKUP_COST", 0)
+    elif request.param == "index walk":
+        monkeypatch.setattr(app_module, "SEARCH_LOOKUP_COST", 10 ** 9)
+    else:
+        monkeypatch.setattr(app_module, "SEARCH_ID_LIST_LIMIT", 0)
+    return request.param
+
+#---------------Bitmaps-----------------#
+def test_bitmap_round_trip():
+    ids = [0, 1, 7, 8, 63, 64, 65, 1000, 4097]
+    bitmap = ids_to_bitmap(ids)
+    assert bitmap_ids(bitmap) == ids
+    assert bitmap.bit_count() == len(ids)
+    members = BitmapSet(bitmap)
+    assert [id for id in range(5000) if id in members] == ids
+    assert bitmap_ids(ids_to_bitmap([])) == []
+
+def test_term_bitmaps_reload_after_a_version_change():
+    loads = []
+    def load(term):
+        loads.append(term)
+        return [1, 2] if term == "shirt" else [2, 3]
+    bitmaps = TermBitmaps(max_entries=1)
+    assert bitmap_ids(bitmaps.match("1", ["blue", "shirt"], load)) == [2]
+    bitmaps.get("1", "blue", load)
+    assert loads == ["blue", "shirt", "blue"] #shirt evicted blue
+    bitmaps.get("1", "blue", load)
+    bitmaps.get("2", "blue", load)
+    assert loads == ["blue", "shirt", "blue", "blue"]
+
+#---------------Index sync-----------------#
+def test_create_indexes_the_product(client):
+    client.post('/products', json={"product_name": "Blue Shirt", "price": 10})
+    client.post('/products/bulk', json=[{"product_name": "blue hat", "price": 5}, {"product_name": "red shirt", "price": 8}])
+    assert search(client, 'q=BLUE') == ["Blue Shirt", "blue hat"] #names sort case-sensitively, words match lower-cased
+    assert search(client, 'q=shi blu') == ["Blue Shirt"]
+    assert stored_terms() == [(1, "blue"), (1, "shirt"), (2, "blue"), (2, "hat"), (3, "red"), (3, "shirt")]
+
+def test_create_after_delete_reusing_the_id(client):
+    #new products skip deleting old terms (replace=False), deleting a product must not leave any behind for a reused id
+    client.post('/products', json={"product_name": "blue shirt", "price": 10})
+    client.delete('/product/1')
+    client.post('/products', json={"product_name": "red hat", "price": 5})
+    assert client.get('/product/1').json["product_name"] == "red hat" #SQLite hands out the id again
+    assert search(client, 'q=blue') == []
+    assert search(client, 'q=red') == ["red hat"]
+    assert stored_terms() == [(1, "hat"), (1, "red")]
+
+def test_update_reindexes_the_product(client):
+    client.post('/products', json={"product_name": "blue shirt", "price": 10})
+    assert search(client, 'q=blue') == ["blue shirt"]
+    client.put('/product/1', json={"product_name": "green shirt", "price": 10})
+    assert search(client, 'q=blue') == []
+    assert search(client, 'q=green shirt') == ["green shirt"]
+    assert stored_terms() == [(1, "green"), (1, "shirt")]
+
+def test_bulk_update_reindexes_the_products(client):
+    client.post('/products/bulk', json=[{"product_name": "blue shirt", "price": 10}, {"product_name": "blue hat", "price": 5}])
+    assert search(client, 'q=blue') == ["blue hat", "blue shirt"]
+    client.put('/products/bulk', json=[{"id": 1, "product_name": "red shirt", "price": 10}, {"id": 2, "product_name": "blue cap", "price": 5}])
+    assert search(client, 'q=blue') == ["blue cap"]
+    assert search(client, 'q=hat') == []
+    assert search(client, 'q=red') == ["red shirt"]
+    assert stored_terms() == [(1, "red"), (1, "shirt"), (2, "blue"), (2, "cap")]
+
+def test_delete_unindexes_the_product(client):
+    client.post('/products/bulk', json=[{"product_name": "blue shirt", "price": 10}, {"product_name": "blue hat", "price": 5}])
+    assert search(client, 'q=blue') == ["blue hat", "blue shirt"]
+    client.delete('/product/2')
+    assert search(client, 'q=blue') == ["blue shirt"]
+    assert stored_terms() == [(1, "blue"), (1, "shirt")]
+
+#---------------Sorting and cursors-----------------#
+PRODUCTS = [("blue shirt a", 30), ("red shirt", 10), ("blue shirt b", 10), ("blue hat", 10), ("blue shirt c", 20),
+            ("blue shirt d", 10), ("green shirt", 5), ("blue shirt e", 40), ("blue shirt f", 20)]
+
+def test_sort_by_price_pages_with_cursors(client, strategy):
+    client.post('/products/bulk', json=[{"product_name": name, "price": price} for name, price in PRODUCTS])
+    #equal prices are ordered by id
+    expected = ["blue shirt b", "blue shirt d", "blue shirt c", "blue shirt f", "blue shirt a", "blue shirt e"]
+    assert all_pages(client, 'q=blue shirt&sort=price') == expected
+    assert all_pages(client, 'q=blue shirt&sort=price', limit=2) == expected
+    assert all_pages(client, 'q=blue shirt&sort=-price') == expected[::-1]
+
+def test_sort_by_name_descending_pages_with_cursors(client, strategy):
+    client.post('/products/bulk', json=[{"product_name": name, "price": price} for name, price in PRODUCTS])
+    expected = ["blue shirt f", "blue shirt e", "blue shirt d", "blue shirt c", "blue shirt b", "blue shirt a"]
+    assert all_pages(client, 'q=blue shirt&sort=-name') == expected
+    assert all_pages(client, 'q=shirt blue&sort=-name', limit=4) == expected
+    assert all_pages(client, 'q=blue shirt&sort=-name&min_price=15') == ["blue shirt f", "blue shirt e", "blue shirt c", "blue shirt a"]
+
+def test_search_pages_follow_writes(client, strategy):
+    client.post('/products/bulk', json=[{"product_name": name, "price": price} for name, price in PRODUCTS])
+    assert all_pages(client, 'q=blue&sort=name')[:2] == ["blue hat", "blue shirt a"]
+    client.put('/product/4', json={"product_name": "grey hat", "price": 10})
+    client.post('/products', json={"product_name": "blue scarf", "price": 1})
+    assert all_pages(client, 'q=blue&sort=name') == ["blue scarf", "blue shirt a", "blue shirt b", "blue shirt c", "blue shirt d", "blue shirt e", "blue shirt f"]
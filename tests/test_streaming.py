@@ -0,0 +1,41 @@
+import json
+import app as app_module
+
+
+def read_ndjson(response):
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+def test_stream_reads_every_chunk_in_id_order(client, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_CHUNK_SIZE", 3)
+    client.post('/users/bulk', json=[{"name": f"user {i}", "address": f"{i} Main St", "email": f"user{i}@example.com"} for i in range(10)])
+    rows = read_ndjson(client.get('/users?stream=1'))
+    assert [row["id"] for row in rows] == list(range(1, 11))
+    assert rows[0] == {"id": 1, "name": "user 0", "address": "0 Main St", "email": "user0@example.com"}
+
+def test_stream_starts_after_the_cursor(client, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_CHUNK_SIZE", 3)
+    client.post('/products/bulk', json=[{"product_name": f"product {i}", "price": i} for i in range(7)])
+    cursor = client.get('/products?limit=2').headers['X-Next-Cursor']
+    rows = read_ndjson(client.get(f'/products?stream=1&fields=price&after={cursor}'))
+    assert rows == [{"id": id, "price": float(id - 1)} for id in range(3, 8)]
+
+def test_stream_of_an_exact_number_of_chunks(client, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_CHUNK_SIZE", 2)
+    client.post('/products/bulk', json=[{"product_name": f"product {i}", "price": i} for i in range(4)])
+    rows = read_ndjson(client.get('/products', headers={"Accept": "application/x-ndjson"}))
+    assert [row["id"] for row in rows] == [1, 2, 3, 4]
+
+def test_stream_orders_with_products_across_chunks(client, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_CHUNK_SIZE", 3)
+    client.post('/users', json={"name": "ann", "address": "1 Main St", "email": "ann@example.com"})
+    client.post('/products/bulk', json=[{"product_name": f"product {i}", "price": i + 1} for i in range(3)])
+    for order_id in range(1, 9): #more orders than STREAM_CHUNK_SIZE, so expand runs between chunk queries
+        client.post('/order', json={"user_id": 1})
+        client.put(f'/orders/{order_id}/add_products', json={"product_ids": [order_id % 3 + 1, (order_id + 1) % 3 + 1]})
+    for url in ('/orders?stream=1&expand=products', '/orders/user/1?stream=1&expand=products'):
+        rows = read_ndjson(client.get(url))
+        assert [row["id"] for row in rows] == list(range(1, 9))
+        for row in rows:
+            expected = sorted([row["id"] % 3 + 1, (row["id"] + 1) % 3 + 1])
+            assert row["products"] == [{"id": id, "name": f"product {id - 1}"} for id in expected]